@@ -0,0 +1,143 @@
+"""
+Benchmark of the xml_parser engines (etree vs lxml).
+
+Generates synthetic Fileset/ACAML/ACMD/Content Types/SampleContainerInfo
+documents, checks that every engine produces byte-identical reports and
+prints the average parse time per engine.
+
+Usage:
+    python bench_xml_parser.py [--scale 200] [--repeat 5]
+"""
+import argparse
+import base64
+import gzip
+import os
+import tempfile
+import time
+
+from xml_parser import ENGINES, parse_xml
+
+ACAML_NS = "urn:schemas-agilent-com:acaml21"
+ACMD_NS = "urn:schemas-agilent-com:acmd20"
+FILESET_NS = "urn:schemas-agilent-com:Fileset"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+
+def make_acaml(scale):
+    parts = [f'<?xml version="1.0" encoding="utf-8"?>\n<ACAML xmlns="{ACAML_NS}">']
+    parts.append('<Checksum Algorithm="SHA1"><Value>abc</Value></Checksum>')
+    parts.append('<MigrationStep><FromNamespace>a</FromNamespace><ToNamespace>b</ToNamespace>'
+                 '<Date>2024-01-01</Date><Application>App</Application></MigrationStep>')
+    parts.append('<Doc><DocID>42</DocID><DocInfo><Description>Bench</Description>'
+                 '<CreatedByUser>user</CreatedByUser><AgilentApp><Name>OpenLab</Name>'
+                 '<Version>2.7</Version></AgilentApp><CreationDate>2024-01-01</CreationDate>'
+                 '<ClientName>PC</ClientName>'
+                 '<CustomField Name="Project"><Value>P1</Value></CustomField></DocInfo></Doc>')
+    parts.append('<Resources><Instrument id="i1"><Name>LC</Name><Technique>LC</Technique>')
+    for m in range(8):
+        parts.append(f'<Module><Name>M{m}</Name><Type>T</Type><Manufacturer>Agilent</Manufacturer>'
+                     f'<PartNo>G{m}</PartNo><SerialNo>S{m}</SerialNo><FirmwareRevision>1</FirmwareRevision>'
+                     f'<ConnectionInfo>lan</ConnectionInfo><Instance>1</Instance></Module>')
+    parts.append('</Instrument></Resources>')
+    for i in range(scale):
+        parts.append(f'<InjectionMetaData AcqMethodName="m.amx" SampleName="S{i} &amp; co" '
+                     f'SampleDescription="d" InjectorPosition="P1" VialNumber="{i}" '
+                     f'InjectionAcqDateTime="2024" RawDataFileName="f{i}.dx" Extra="x">'
+                     f'<Dil>1</Dil><InjVolume>5</InjVolume></InjectionMetaData>')
+    for i in range(scale):
+        parts.append(f'<Signal><Type>DAD</Type><Name>DAD1A</Name><Description>Sig {i}</Description>'
+                     f'<TraceID>t{i}</TraceID><DetectorName>DAD</DetectorName><ChannelName>A</ChannelName>'
+                     f'<DataItem><Name>d{i}</Name><Path>p/{i}.ch</Path></DataItem></Signal>')
+    parts.append('</ACAML>')
+    return "".join(parts)
+
+
+def make_acmd(scale):
+    parts = [f'<?xml version="1.0" encoding="utf-8"?>\n<ACMD xmlns="{ACMD_NS}">']
+    parts.append('<InjectionInfo><SampleName>S</SampleName><Location>P1-A-01</Location>'
+                 '<RunOperator>op</RunOperator><RunDateTime>2024</RunDateTime>'
+                 '<InjectionVolume>5</InjectionVolume><InjectionVolumeUnits>uL</InjectionVolumeUnits>'
+                 '<SequenceLine>1</SequenceLine><Replicate>1</Replicate>'
+                 '<InjectionSource>AutoSampler</InjectionSource>'
+                 '<AcquisitionMethod>m.amx</AcquisitionMethod><Barcode/></InjectionInfo>')
+    for i in range(scale):
+        parts.append(f'<Signal><DeviceName>DAD{i % 3}</DeviceName><ChannelName>A</ChannelName>'
+                     f'<Description>Sig {i}</Description><Encoding>x/y/Float64</Encoding>'
+                     f'<Units>mAU</Units><NumberOfValues>1000</NumberOfValues><TimeStart>0</TimeStart>'
+                     f'<TimeEnd>10</TimeEnd><Minimum>-1</Minimum><Maximum>100</Maximum>'
+                     f'<TraceId>t{i}</TraceId><DeviceNumber>1</DeviceNumber><Slope>1</Slope>'
+                     f'<ScaleFactor>1</ScaleFactor><DetectorType>UV</DetectorType>'
+                     f'<IsIntegrable>{"true" if i % 2 else "false"}</IsIntegrable></Signal>')
+    parts.append('<ExternalElementPaths>a.ch</ExternalElementPaths></ACMD>')
+    return "".join(parts)
+
+
+def make_fileset(scale):
+    parts = [f'<Fileset xmlns="{FILESET_NS}" IdentifierAlgorithm="SHA256" Identifier="root">']
+    for i in range(scale):
+        parts.append(f'<File Path="f{i}.dx" IdentifierAlgorithm="SHA256" Identifier="{i:064x}">'
+                     f'<Property Name="Size" Value="{i}"/></File>')
+    parts.append('</Fileset>')
+    return "".join(parts)
+
+
+def make_content_types(scale):
+    parts = [f'<Types xmlns="{CT_NS}">']
+    for i in range(scale):
+        parts.append(f'<Default Extension="e{i}" ContentType="application/x-{i}"/>')
+    parts.append('</Types>')
+    return "".join(parts)
+
+
+def make_sample_container(scale):
+    payload = base64.b64encode(gzip.compress(("<Tray>" + "<Vial/>" * scale + "</Tray>").encode())).decode()
+    return ('<SampleContainerInfo><ContainerDeviceInfo ModuleId="G7129A">'
+            '<SerialNumber>DE1</SerialNumber><PartNumber>G7129A</PartNumber>'
+            '<SampleContainerDevice ContentType="GZipCompressedBase64Xml">'
+            f'<XmlContent>{payload}</XmlContent></SampleContainerDevice>'
+            '</ContainerDeviceInfo></SampleContainerInfo>')
+
+
+GENERATORS = {
+    "acaml": make_acaml,
+    "acmd": make_acmd,
+    "fileset": make_fileset,
+    "content_types": make_content_types,
+    "sample_container": make_sample_container,
+}
+
+
+def run_benchmark(scale=200, repeat=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {}
+        for kind, generate in GENERATORS.items():
+            path = os.path.join(tmp, f"{kind}.xml")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(generate(scale))
+            files[kind] = path
+
+        print(f"Engines: {', '.join(ENGINES)} | scale={scale} repeat={repeat}")
+        for kind, path in files.items():
+            outputs = {}
+            timings = {}
+            for engine in ENGINES:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    outputs[engine] = parse_xml(path, engine=engine)
+                timings[engine] = (time.perf_counter() - start) / repeat
+
+            reference = outputs["etree"]
+            identical = all(out == reference for out in outputs.values())
+            row = "  ".join(f"{engine}: {timings[engine] * 1000:8.2f} ms" for engine in ENGINES)
+            print(f"{kind:<17} {row}  identical={identical}")
+            if not identical:
+                raise SystemExit(f"Output mismatch between engines for {kind}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of xml_parser engines")
+    parser.add_argument("--scale", type=int, default=200, help="Number of repeated elements per document")
+    parser.add_argument("--repeat", type=int, default=5, help="Parses per engine and document")
+    args = parser.parse_args()
+
+    run_benchmark(args.scale, args.repeat)
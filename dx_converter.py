@@ -3,7 +3,35 @@ import subprocess
 import os
 from typing import Optional
 
-def convert_dx_to_csv(dx_file: str, mode: str = "clean", r_script_path: Optional[str] = None) -> None:
+def ensure_r_packages(r_script_path: Optional[str] = None) -> None:
+    """
+    Проверяет и при необходимости устанавливает R-пакеты один раз,
+    до параллельного запуска конвертаций (иначе каждый процесс Rscript
+    устанавливал бы их в одну и ту же библиотеку одновременно).
+    
+    Параметры:
+        r_script_path (str, optional): Путь к R-скрипту. Если None, ищется в той же директории.
+    """
+    if r_script_path is None:
+        r_script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dx_converter.R")
+    if not os.path.exists(r_script_path):
+        raise FileNotFoundError(f"R-скрипт не найден: {r_script_path}")
+    
+    try:
+        result = subprocess.run(
+            ["Rscript", "--vanilla", r_script_path, "--install-packages"],
+            check=True,
+            capture_output=True,
+            text=True
+        )
+        if result.stderr:
+            print(result.stderr)
+    except subprocess.CalledProcessError as e:
+        print(f"Ошибка при установке R-пакетов: {e.stderr}")
+        raise
+
+def convert_dx_to_csv(dx_file: str, mode: str = "clean", r_script_path: Optional[str] = None,
+                      previews: bool = False) -> None:
     """
     Конвертирует файл .dx в CSV и другие файлы, используя R-скрипт.
     
@@ -11,6 +39,7 @@ def convert_dx_to_csv(dx_file: str, mode: str = "clean", r_script_path: Optional
         dx_file (str): Путь к .dx файлу для конвертации
         mode (str): Режим работы ("clean" или "full")
         r_script_path (str, optional): Путь к R-скрипту. Если None, ищется в той же директории.
+        previews (bool): Построить уменьшенные превью (LTTB и min/max) для каждого CSV
     
     Возвращает:
         None
@@ -51,6 +80,19 @@ def convert_dx_to_csv(dx_file: str, mode: str = "clean", r_script_path: Optional
     except Exception as e:
         print(f"Неожиданная ошибка: {str(e)}")
         raise
+    
+    # Превью строятся по уже декодированным CSV, каждый файл читается один раз.
+    # Это дополнительный результат: ошибка превью не отменяет конвертацию.
+    if previews:
+        output_dir = os.path.splitext(dx_file)[0]
+        if os.path.isdir(output_dir):
+            try:
+                from previews import build_previews
+                
+                for preview_path in build_previews(output_dir):
+                    print(f"Превью сохранено: {preview_path}")
+            except Exception as e:
+                print(f"Предупреждение: превью не построены для {output_dir}: {str(e)}")
 
 if __name__ == "__main__":
     # Пример использования
@@ -60,6 +102,8 @@ if __name__ == "__main__":
     parser.add_argument("dx_file", help="Путь к DX файлу")
     parser.add_argument("--mode", default="clean", choices=["clean", "full"], 
                        help="Режим работы: clean (только CSV) или full (все файлы)")
+    parser.add_argument("--previews", action="store_true",
+                       help="Построить превью LTTB и min/max для каждого CSV")
     args = parser.parse_args()
     
-    convert_dx_to_csv(args.dx_file, args.mode)
\ No newline at end of file
+    convert_dx_to_csv(args.dx_file, args.mode, previews=args.previews)
\ No newline at end of file
@@ -4,6 +4,24 @@ import glob
 import sys
 from datetime import datetime
 
+# Output settings: compression of .txt/.csv results (None, "gzip", "xz", "zstd")
+# and packing of every run folder into one indexed <folder>.zip
+OUTPUT_COMPRESSION = None
+BUNDLE_OUTPUTS = False
+
+# Job scheduler: parallel workers, limits per file/worker, files of ISOLATE_MB
+# or more run in a worker of their own, at most MAX_ISOLATED_JOBS of them at once;
+# timings are kept in Output/SCHEDULER_STATS
+SCHEDULER_WORKERS = os.cpu_count() or 1
+JOB_TIMEOUT = 3600  # seconds per file
+JOB_MEMORY_MB = 4096
+ISOLATE_MB = 100
+MAX_ISOLATED_JOBS = 1
+SCHEDULER_STATS = ".scheduler_stats.json"
+
+# Handling of XML types the parser does not interpret, see process_xml_files
+UNKNOWN_XML_MODES = ("report", "copy", "skip")
+
 def copy_input_folders():
     """Copies all folders from Data_to_parse to Output directory"""
     input_dir = "Data_to_parse"
@@ -29,10 +47,48 @@ def copy_input_folders():
     
     return output_dir
 
-def process_dx_files(root_dir):
-    """Processes all .dx files with proper cleanup"""
+def run_scheduled(root_dir, files, handler, classify=None, **kwargs):
+    """
+    Runs handler(file, **kwargs) for all files through the size-aware job scheduler.
+    Handlers log and re-raise their errors, so failed files are counted here
+    and their timings are not learned by the cost model.
+    """
+    from scheduler import run_jobs, file_kind
+    
+    result = run_jobs(files, handler, kwargs,
+                      workers=SCHEDULER_WORKERS,
+                      timeout=JOB_TIMEOUT,
+                      memory_mb=JOB_MEMORY_MB,
+                      isolate_mb=ISOLATE_MB,
+                      max_isolated=MAX_ISOLATED_JOBS,
+                      classify=classify or file_kind,
+                      stats_path=os.path.join(root_dir, SCHEDULER_STATS))
+    
+    if result['failed']:
+        print(f"\n{len(result['failed'])} of {len(files)} files failed: {', '.join(result['failed'])}")
+    return result
+
+def process_dx_file(dx_file, previews=False):
+    """Converts one .dx file to CSV and removes it after success"""
     from dx_converter import convert_dx_to_csv
     
+    try:
+        print(f"\nProcessing: {dx_file}")
+        convert_dx_to_csv(dx_file, mode="clean", previews=previews)
+        
+        output_dir = os.path.splitext(dx_file)[0]
+        if os.path.exists(output_dir):
+            os.remove(dx_file)
+            print(f"Successfully converted and removed: {dx_file}")
+        else:
+            raise RuntimeError(f"Output folder not found: {output_dir}")
+            
+    except Exception as e:
+        print(f"Error processing {dx_file}: {str(e)}")
+        raise
+
+def process_dx_files(root_dir, previews=False):
+    """Processes all .dx files with proper cleanup, optionally building chromatogram previews"""
     print("\n=== Processing .dx files ===")
     dx_files = []
     
@@ -41,25 +97,66 @@ def process_dx_files(root_dir):
             if filename.lower().endswith('.dx'):
                 dx_files.append(os.path.join(dirpath, filename))
     
-    for dx_file in dx_files:
+    if not dx_files:
+        return
+    
+    # R packages are installed once here, not by every parallel Rscript
+    try:
+        from dx_converter import ensure_r_packages
+        ensure_r_packages()
+    except Exception as e:
+        print(f"Error preparing R packages, .dx files skipped: {str(e)}")
+        return
+    
+    run_scheduled(root_dir, dx_files, process_dx_file, previews=previews)
+
+def process_signal_matrices(root_dir):
+    """Builds an aligned signal matrix for every sequence folder with converted .dx traces"""
+    from signal_matrix import build_sequence_matrix, find_injection_dirs
+    
+    print("\n=== Building sequence signal matrices ===")
+    sequence_dirs = []
+    
+    for dirpath, _, _ in os.walk(root_dir):
+        injection_dirs = find_injection_dirs(dirpath)
+        if injection_dirs:
+            sequence_dirs.append((dirpath, injection_dirs))
+    
+    for sequence_dir, injection_dirs in sequence_dirs:
         try:
-            print(f"\nProcessing: {dx_file}")
-            convert_dx_to_csv(dx_file, mode="clean")
-            
-            output_dir = os.path.splitext(dx_file)[0]
-            if os.path.exists(output_dir):
-                os.remove(dx_file)
-                print(f"Successfully converted and removed: {dx_file}")
+            print(f"\nProcessing: {sequence_dir} ({len(injection_dirs)} injections)")
+            store_dir = build_sequence_matrix(sequence_dir, injection_dirs)
+            if store_dir:
+                print(f"Signal matrix saved to: {store_dir}")
             else:
-                print(f"Warning: Output folder not found: {output_dir}")
+                print(f"No traces found in: {sequence_dir}")
                 
         except Exception as e:
-            print(f"Error processing {dx_file}: {str(e)}")
+            print(f"Error building signal matrix for {sequence_dir}: {str(e)}")
 
-def process_scml_files(root_dir):
-    """Converts SCML to XML with proper suffix and cleanup"""
+def process_scml_file(scml_file):
+    """Converts one SCML file to XML and removes it after success"""
     from scml_to_xml import scml_to_xml
     
+    try:
+        print(f"\nProcessing: {scml_file}")
+        xml_file = f"{os.path.splitext(scml_file)[0]}_scml.xml"
+        
+        scml_to_xml(scml_file, xml_file)
+        
+        if os.path.exists(xml_file):
+            os.remove(scml_file)
+            print(f"Converted to: {xml_file}")
+            print(f"Removed original: {scml_file}")
+        else:
+            raise RuntimeError(f"Output file not created: {xml_file}")
+            
+    except Exception as e:
+        print(f"Error converting {scml_file}: {str(e)}")
+        raise
+
+def process_scml_files(root_dir):
+    """Converts SCML to XML with proper suffix and cleanup"""
     print("\n=== Processing .scml files ===")
     scml_files = []
     
@@ -68,27 +165,48 @@ def process_scml_files(root_dir):
             if filename.lower().endswith('.scml'):
                 scml_files.append(os.path.join(dirpath, filename))
     
-    for scml_file in scml_files:
-        try:
-            print(f"\nProcessing: {scml_file}")
-            xml_file = f"{os.path.splitext(scml_file)[0]}_scml.xml"
-            
-            scml_to_xml(scml_file, xml_file)
+    run_scheduled(root_dir, scml_files, process_scml_file)
+
+def process_acaml_acmd_mfx_file(file_path):
+    """Converts one acaml/acmd/mfx file to XML with format suffix and removes the original"""
+    from acaml_acmd_mfx_to_xml import rename_to_xml
+    
+    try:
+        print(f"\nProcessing: {file_path}")
+        
+        # Generate new filename with original extension marker
+        base_name = os.path.splitext(file_path)[0]
+        original_ext = os.path.splitext(file_path)[1][1:]  # Remove dot
+        xml_file = f"{base_name}_{original_ext}.xml"
+        
+        # Skip if the converted file already exists (from previous run)
+        if os.path.exists(xml_file):
+            print(f"Skipping - already converted: {xml_file}")
+            return
             
+        # Perform the conversion
+        if rename_to_xml(file_path, os.path.dirname(file_path), os.path.basename(xml_file)):
+            # Verify the new file was created
             if os.path.exists(xml_file):
-                os.remove(scml_file)
-                print(f"Converted to: {xml_file}")
-                print(f"Removed original: {scml_file}")
+                # Remove original only after successful conversion
+                try:
+                    os.remove(file_path)
+                    print(f"Successfully converted to: {xml_file}")
+                    print(f"Removed original: {file_path}")
+                except Exception as remove_error:
+                    print(f"Converted but failed to remove original: {file_path}")
+                    print(f"Error: {str(remove_error)}")
             else:
-                print(f"Error: Output file not created: {xml_file}")
-                
-        except Exception as e:
-            print(f"Error converting {scml_file}: {str(e)}")
+                raise RuntimeError(f"Conversion failed - output not created: {xml_file}")
+        else:
+            raise RuntimeError(f"Conversion failed for: {file_path}")
+            
+    except Exception as e:
+        print(f"Error processing {file_path}: {str(e)}")
+        raise
 
 def process_acaml_acmd_mfx_files(root_dir):
     """Converts acaml/acmd/mfx files to XML with format suffix and proper cleanup"""
-    from acaml_acmd_mfx_to_xml import rename_to_xml
-    
     print("\n=== Processing acaml/acmd/mfx files ===")
     target_exts = ['.acaml', '.acmd', '.mfx']
     target_files = []
@@ -101,43 +219,65 @@ def process_acaml_acmd_mfx_files(root_dir):
                 target_files.append(os.path.join(dirpath, filename))
     
     # Then process them with verification
-    for file_path in target_files:
-        try:
-            print(f"\nProcessing: {file_path}")
-            
-            # Generate new filename with original extension marker
-            base_name = os.path.splitext(file_path)[0]
-            original_ext = os.path.splitext(file_path)[1][1:]  # Remove dot
-            xml_file = f"{base_name}_{original_ext}.xml"
+    run_scheduled(root_dir, target_files, process_acaml_acmd_mfx_file)
+
+def xml_job_kind(xml_file):
+    """Scheduler kind of an XML file: extension plus the sniffed document type"""
+    from xml_parser import sniff_root_tag, detect_xml_type
+    
+    root_tag = sniff_root_tag(xml_file)
+    xml_type = detect_xml_type(root_tag) if root_tag is not None else None
+    return f".xml:{xml_type or 'unknown'}"
+
+def check_unknown_mode(unknown):
+    """Raises ValueError for an unknown-XML mode outside UNKNOWN_XML_MODES"""
+    if unknown not in UNKNOWN_XML_MODES:
+        raise ValueError(f"Unknown XML mode: {unknown!r} (available: {', '.join(UNKNOWN_XML_MODES)})")
+
+def process_xml_file(xml_file, unknown="report", compression=None):
+    """Processes one XML file to TXT and removes it after success"""
+    check_unknown_mode(unknown)
+    from xml_parser import parse_xml, save_to_txt, sniff_root_tag, detect_xml_type
+    from output_sinks import compress_file
+    
+    try:
+        print(f"\nProcessing: {xml_file}")
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        txt_file = f"{os.path.splitext(xml_file)[0]}_{timestamp}.txt"
+        
+        root_tag = sniff_root_tag(xml_file) if unknown != "report" else None
+        if root_tag is not None and detect_xml_type(root_tag) is None:
+            if unknown == "skip":
+                print(f"Skipping unknown XML type {root_tag}: {xml_file}")
+                return
+            shutil.copyfile(xml_file, txt_file)
+            if compression:
+                txt_file = compress_file(txt_file, compression)
+            print(f"Copied unknown XML type {root_tag} as is")
+        else:
+            parsed_content = parse_xml(xml_file)
+            txt_file = save_to_txt(parsed_content, txt_file, compression)
+        
+        if os.path.exists(txt_file):
+            os.remove(xml_file)
+            print(f"Converted to: {txt_file}")
+            print(f"Removed original: {xml_file}")
+        else:
+            raise RuntimeError(f"Output file not created: {txt_file}")
             
-            # Skip if the converted file already exists (from previous run)
-            if os.path.exists(xml_file):
-                print(f"Skipping - already converted: {xml_file}")
-                continue
-                
-            # Perform the conversion
-            if rename_to_xml(file_path, os.path.dirname(file_path), os.path.basename(xml_file)):
-                # Verify the new file was created
-                if os.path.exists(xml_file):
-                    # Remove original only after successful conversion
-                    try:
-                        os.remove(file_path)
-                        print(f"Successfully converted to: {xml_file}")
-                        print(f"Removed original: {file_path}")
-                    except Exception as remove_error:
-                        print(f"Converted but failed to remove original: {file_path}")
-                        print(f"Error: {str(remove_error)}")
-                else:
-                    print(f"Conversion failed - output not created: {xml_file}")
-            else:
-                print(f"Conversion failed for: {file_path}")
-                
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
+    except Exception as e:
+        print(f"Error processing {xml_file}: {str(e)}")
+        raise
 
-def process_xml_files(root_dir):
-    """Processes XML files to TXT with proper cleanup"""
-    from xml_parser import parse_xml, save_to_txt
+def process_xml_files(root_dir, unknown="report", compression=None):
+    """
+    Processes XML files to TXT with proper cleanup.
+    unknown: how to handle XML types the parser does not interpret, detected
+    by sniffing the root tag: "report" (txt with the full content),
+    "copy" (plain byte copy to .txt) or "skip" (leave the .xml untouched)
+    compression: None, "gzip", "xz" or "zstd" to write compressed .txt files
+    """
+    check_unknown_mode(unknown)
     
     print("\n=== Processing XML files ===")
     xml_files = []
@@ -147,24 +287,34 @@ def process_xml_files(root_dir):
             if filename.lower().endswith('.xml'):
                 xml_files.append(os.path.join(dirpath, filename))
     
-    for xml_file in xml_files:
+    run_scheduled(root_dir, xml_files, process_xml_file, classify=xml_job_kind,
+                  unknown=unknown, compression=compression)
+
+def finalize_outputs(root_dir, compression=None, bundle=False):
+    """
+    Reduces the size and file count of the results of every run folder:
+    compression - stream-compress remaining .txt/.csv files ("gzip"/"xz"/"zstd")
+    bundle - pack each run folder into <folder>.zip with a member index
+    """
+    from output_sinks import bundle_folder, compress_outputs
+    
+    if compression is None and not bundle:
+        return
+    
+    print("\n=== Finalizing outputs ===")
+    run_folders = [f for f in glob.glob(os.path.join(root_dir, '*')) if os.path.isdir(f)]
+    
+    for folder in run_folders:
         try:
-            print(f"\nProcessing: {xml_file}")
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            txt_file = f"{os.path.splitext(xml_file)[0]}_{timestamp}.txt"
-            
-            parsed_content = parse_xml(xml_file)
-            save_to_txt(parsed_content, txt_file)
-            
-            if os.path.exists(txt_file):
-                os.remove(xml_file)
-                print(f"Converted to: {txt_file}")
-                print(f"Removed original: {xml_file}")
+            if bundle:
+                bundle_path = bundle_folder(folder, compression=compression)
+                print(f"Bundled: {folder} → {bundle_path}")
             else:
-                print(f"Error: Output file not created: {txt_file}")
+                compressed = compress_outputs(folder, compression)
+                print(f"Compressed {len(compressed)} files in: {folder}")
                 
         except Exception as e:
-            print(f"Error processing {xml_file}: {str(e)}")
+            print(f"Error finalizing {folder}: {str(e)}")
 
 def main():
     print("=== Starting Data Processing Pipeline ===")
@@ -173,17 +323,23 @@ def main():
         # Step 1: Copy folders
         output_root = copy_input_folders()
         
-        # Step 2: Process .dx files
-        process_dx_files(output_root)
+        # Step 2: Process .dx files (previews=False to skip the LTTB/min-max previews)
+        process_dx_files(output_root, previews=True)
         
-        # Step 3: Process .scml files
+        # Step 3: Align converted traces of each sequence
+        process_signal_matrices(output_root)
+        
+        # Step 4: Process .scml files
         process_scml_files(output_root)
         
-        # Step 4: Process acaml/acmd/mfx files
+        # Step 5: Process acaml/acmd/mfx files
         process_acaml_acmd_mfx_files(output_root)
         
-        # Step 5: Process XML files
-        process_xml_files(output_root)
+        # Step 6: Process XML files
+        process_xml_files(output_root, compression=OUTPUT_COMPRESSION)
+        
+        # Step 7: Compress and/or bundle the results
+        finalize_outputs(output_root, compression=OUTPUT_COMPRESSION, bundle=BUNDLE_OUTPUTS)
         
         print("\n=== Processing Complete ===")
         print("All files processed successfully with proper cleanup.")
@@ -0,0 +1,141 @@
+import gzip
+import json
+import lzma
+import os
+import shutil
+import zipfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Supported stream compressions and the suffix they add to the file name
+COMPRESSIONS = {'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst'}
+# File types compressed by the output stage
+COMPRESSIBLE_EXTS = ('.txt', '.csv')
+# Bundle members stored as is: already compressed or read by offset
+STORED_EXTS = ('.gz', '.xz', '.zst', '.zip', '.npz', '.npy')
+# Folders kept next to the bundle because they are memory-mapped in place
+UNBUNDLED_DIRS = ('signal_matrix',)
+BUNDLE_INDEX = "bundle_index.json"
+
+def _check_compression(compression):
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression} (available: {', '.join(COMPRESSIONS)})")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression requires the 'zstandard' package")
+
+def _open(path, compression, mode, encoding):
+    encoding = encoding if 't' in mode else None
+    if compression is None:
+        return open(path, mode, encoding=encoding)
+    _check_compression(compression)
+    if compression == 'gzip':
+        return gzip.open(path, mode, encoding=encoding)
+    if compression == 'xz':
+        return lzma.open(path, mode, encoding=encoding)
+    return zstandard.open(path, mode, encoding=encoding)
+
+def output_path(path, compression=None):
+    """Returns the file name with the suffix of the compression"""
+    if compression is None:
+        return path
+    _check_compression(compression)
+    return path + COMPRESSIONS[compression]
+
+def open_output(path, compression=None, mode='wt', encoding='utf-8'):
+    """Opens a streaming writer ('wt' or 'wb') for a path returned by output_path"""
+    return _open(path, compression, mode, encoding)
+
+def open_input(path, mode='rt', encoding='utf-8'):
+    """Opens a plain or compressed output file, the compression is taken from the suffix"""
+    for compression, suffix in COMPRESSIONS.items():
+        if path.lower().endswith(suffix):
+            return _open(path, compression, mode, encoding)
+    return _open(path, None, mode, encoding)
+
+def compress_file(path, compression, remove=True):
+    """
+    Stream-compresses a file next to the original.
+
+    Returns:
+        Path to the compressed file
+    """
+    target = output_path(path, compression)
+    with open(path, 'rb') as src, open_output(target, compression, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    if remove:
+        os.remove(path)
+    return target
+
+def compress_outputs(root_dir, compression, exts=COMPRESSIBLE_EXTS):
+    """Compresses every report/CSV under root_dir that is not compressed yet"""
+    compressed = []
+    for dirpath, _, filenames in os.walk(root_dir):
+        for filename in filenames:
+            if filename.lower().endswith(exts):
+                compressed.append(compress_file(os.path.join(dirpath, filename), compression))
+    return compressed
+
+def bundle_folder(folder, bundle_path=None, compression=None):
+    """
+    Packs all files of a folder into one zip archive and removes them.
+
+    Every member is compressed on its own (deflate, or LZMA for "xz"), so
+    a single file can be read back without decompressing the others.
+    The archive also carries bundle_index.json with the size of each member.
+    Folders from UNBUNDLED_DIRS stay on disk.
+
+    Returns:
+        Path to the bundle
+    """
+    if bundle_path is None:
+        bundle_path = f"{folder.rstrip(os.sep)}.zip"
+    method = zipfile.ZIP_LZMA if compression == 'xz' else zipfile.ZIP_DEFLATED
+
+    bundled = []
+    index = []
+    with zipfile.ZipFile(bundle_path, 'w', compression=method, allowZip64=True) as bundle:
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames[:] = sorted(d for d in dirnames if d not in UNBUNDLED_DIRS)
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, folder).replace(os.sep, '/')
+                member_method = zipfile.ZIP_STORED if filename.lower().endswith(STORED_EXTS) else method
+                bundle.write(path, name, compress_type=member_method)
+                info = bundle.getinfo(name)
+                index.append({"name": name, "size": info.file_size, "compressed_size": info.compress_size})
+                bundled.append(path)
+        bundle.writestr(BUNDLE_INDEX, json.dumps({"members": index}, indent=2, ensure_ascii=False))
+
+    for path in bundled:
+        os.remove(path)
+    for dirpath, _, _ in sorted(os.walk(folder), key=lambda item: -len(item[0])):
+        if not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+    return bundle_path
+
+def list_bundle(bundle_path):
+    """Returns the member index of a bundle"""
+    with zipfile.ZipFile(bundle_path) as bundle:
+        return json.loads(bundle.read(BUNDLE_INDEX))["members"]
+
+def read_bundle_member(bundle_path, name, encoding='utf-8'):
+    """
+    Reads one member of a bundle, compressed members (.gz/.xz/.zst) are
+    decompressed. Returns text, or bytes when encoding is None.
+    """
+    with zipfile.ZipFile(bundle_path) as bundle:
+        data = bundle.read(name)
+    for compression, suffix in COMPRESSIONS.items():
+        if name.lower().endswith(suffix):
+            if compression == 'gzip':
+                data = gzip.decompress(data)
+            elif compression == 'xz':
+                data = lzma.decompress(data)
+            else:
+                _check_compression(compression)
+                data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data.decode(encoding) if encoding else data
@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+
+from signal_matrix import read_trace_csv
+
+# Preview sizes in points per trace, from overview to zoomed-in plots
+PREVIEW_RESOLUTIONS = (500, 2000, 8000)
+PREVIEW_SUFFIX = "_preview.npz"
+
+def bucket_edges(n_points, n_buckets):
+    """Start indices of n_buckets nearly equal buckets over n_points"""
+    return np.linspace(0, n_points, n_buckets + 1).astype(np.int64)[:-1]
+
+def minmax_envelope(time, values, n_buckets):
+    """
+    Min/max envelope of all channels over n_buckets equal buckets.
+
+    Returns:
+        (bucket_time, minimum, maximum) where bucket_time is the middle of
+        each bucket and minimum/maximum are (n_buckets x channel) arrays
+    """
+    starts = bucket_edges(len(time), n_buckets)
+    ends = np.append(starts[1:], len(time)) - 1
+    minimum = np.fmin.reduceat(values, starts, axis=0)
+    maximum = np.fmax.reduceat(values, starts, axis=0)
+    return (time[starts] + time[ends]) / 2, minimum, maximum
+
+def lttb(time, values, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling of every channel to n_out points.
+    The bucket averages are computed for all channels at once; only the
+    bucket walk itself is sequential.
+
+    Returns:
+        (n_out x channel) array of selected row indices
+    """
+    n_points, n_channels = values.shape
+    if n_out >= n_points or n_out < 3:
+        return np.repeat(np.arange(n_points)[:, None], n_channels, axis=1)
+
+    # Inner buckets between the fixed first and last points
+    starts = 1 + bucket_edges(n_points - 2, n_out - 2)
+    ends = np.append(starts[1:], n_points - 1)
+    counts = (ends - starts)[:, None]
+    avg_time = np.add.reduceat(time[:-1], starts)[:, None] / counts
+    avg_values = np.add.reduceat(values[:-1], starts, axis=0) / counts
+    # Next-bucket averages, the last inner bucket looks at the final point
+    next_time = np.vstack([avg_time[1:], time[-1:, None]])
+    next_values = np.vstack([avg_values[1:], values[-1:]])
+
+    selected = np.empty((n_out, n_channels), dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n_points - 1
+    channels = np.arange(n_channels)
+    prev = selected[0]
+    for i, (lo, hi) in enumerate(zip(starts, ends)):
+        prev_time = time[prev]
+        prev_values = values[prev, channels]
+        area = np.abs((prev_time - next_time[i]) * (values[lo:hi] - prev_values)
+                      - (prev_time - time[lo:hi, None]) * (next_values[i] - prev_values))
+        prev = lo + np.argmax(area, axis=0)
+        selected[i + 1] = prev
+    return selected
+
+def build_trace_previews(csv_path, resolutions=PREVIEW_RESOLUTIONS):
+    """
+    Builds LTTB and min/max previews of one trace CSV at every resolution
+    smaller than the trace and saves them next to it as <trace>_preview.npz.
+
+    Keys of the archive (R is the resolution):
+        columns, resolutions, length
+        lttb_R_time, lttb_R_values        - (R x channel)
+        minmax_R_time, minmax_R_min/_max  - (R,) and (R x channel)
+
+    Returns:
+        Path to the preview archive
+    """
+    columns, time, values = read_trace_csv(csv_path)
+    arrays = {"columns": np.array(columns), "length": np.array(len(time))}
+    built = []
+    for resolution in sorted(resolutions):
+        if resolution >= len(time):
+            continue
+        idx = lttb(time, values, resolution)
+        arrays[f"lttb_{resolution}_time"] = time[idx]
+        arrays[f"lttb_{resolution}_values"] = np.take_along_axis(values, idx, axis=0)
+        bucket_time, minimum, maximum = minmax_envelope(time, values, resolution)
+        arrays[f"minmax_{resolution}_time"] = bucket_time
+        arrays[f"minmax_{resolution}_min"] = minimum
+        arrays[f"minmax_{resolution}_max"] = maximum
+        built.append(resolution)
+    arrays["resolutions"] = np.array(built, dtype=np.int64)
+
+    preview_path = f"{os.path.splitext(csv_path)[0]}{PREVIEW_SUFFIX}"
+    np.savez(preview_path, **arrays)
+    return preview_path
+
+def build_previews(output_dir, resolutions=PREVIEW_RESOLUTIONS):
+    """Builds previews for every trace CSV of a converted .dx folder"""
+    preview_paths = []
+    for name in sorted(os.listdir(output_dir)):
+        if name.lower().endswith('.csv'):
+            preview_paths.append(build_trace_previews(os.path.join(output_dir, name), resolutions))
+    return preview_paths
+
+def load_preview(preview_path, width, kind="minmax"):
+    """
+    Loads the smallest preview with at least width points (kind "lttb" or "minmax").
+    Returns None if the trace is shorter than width, so the full CSV should be used.
+    """
+    with np.load(preview_path) as preview:
+        fitting = [r for r in preview["resolutions"] if r >= width]
+        if not fitting:
+            return None
+        prefix = f"{kind}_{min(fitting)}_"
+        return {key[len(prefix):]: preview[key] for key in preview.files if key.startswith(prefix)}
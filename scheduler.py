@@ -0,0 +1,291 @@
+import json
+import math
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+
+# Default cost model per file kind: (fixed seconds, seconds per byte)
+DEFAULT_COSTS = {
+    '.dx': (2.0, 2e-8),          # Rscript start-up + unzip/decode
+    '.scml': (0.01, 1e-7),
+    '.acaml': (0.001, 1e-9),     # plain copies to .xml
+    '.acmd': (0.001, 1e-9),
+    '.mfx': (0.001, 1e-9),
+    '.xml': (0.005, 2.5e-7),
+}
+FALLBACK_COST = (0.01, 1e-7)
+# Weight of the older timings of a kind on every new sample, recent runs count more
+STATS_DECAY = 0.995
+POLL_INTERVAL = 0.2
+
+class CostModel:
+    """
+    Estimates the processing time of a file as a + b * size per file kind.
+    a and b are fitted by least squares on timings of previous runs stored
+    in stats_path, the defaults are used until a kind has enough samples.
+    """
+
+    def __init__(self, stats_path=None, defaults=DEFAULT_COSTS):
+        self.stats_path = stats_path
+        self.defaults = defaults
+        self.stats = {}
+        if stats_path and os.path.exists(stats_path):
+            try:
+                with open(stats_path, 'r', encoding='utf-8') as f:
+                    loaded = json.load(f)
+                self.stats = {kind: list(sums) for kind, sums in loaded.items()}
+            except (OSError, ValueError) as e:
+                print(f"Warning: ignoring scheduler stats {stats_path}: {str(e)}")
+
+    def coefficients(self, kind):
+        fixed, per_byte = self.defaults.get(kind.split(':')[0], FALLBACK_COST)
+        n, sx, sy, sxx, sxy = self.stats.get(kind, (0, 0, 0, 0, 0))
+        denominator = n * sxx - sx * sx
+        if n >= 3 and denominator > 0:
+            per_byte = max((n * sxy - sx * sy) / denominator, 0.0)
+            fixed = max((sy - per_byte * sx) / n, 0.0)
+        elif n >= 1 and sx > 0:
+            per_byte = max((sy - fixed * n) / sx, 0.0)
+        return fixed, per_byte
+
+    def estimate(self, kind, size):
+        fixed, per_byte = self.coefficients(kind)
+        return fixed + per_byte * size
+
+    def record(self, kind, size, seconds):
+        n, sx, sy, sxx, sxy = (value * STATS_DECAY for value in self.stats.get(kind, (0, 0, 0, 0, 0)))
+        self.stats[kind] = [n + 1, sx + size, sy + seconds, sxx + size * size, sxy + size * seconds]
+
+    def save(self):
+        if self.stats_path:
+            with open(self.stats_path, 'w', encoding='utf-8') as f:
+                json.dump(self.stats, f, indent=2)
+
+def file_kind(path):
+    """Default job kind: the lower-case file extension"""
+    return os.path.splitext(path)[1].lower()
+
+def plan_tasks(jobs, workers, batch_seconds=1.0, isolate_bytes=100 * 1024 * 1024):
+    """
+    Groups jobs into worker tasks, largest estimated cost first.
+
+    Files of isolate_bytes or more always get a task of their own. The
+    other files are batched until a task reaches batch_seconds (lowered so
+    that every worker gets several tasks).
+
+    Args:
+        jobs: list of dicts with path, kind, size and cost
+    Returns:
+        list of tasks (dicts with jobs, cost, isolated) sorted by cost
+    """
+    tasks = []
+    small = []
+    for job in sorted(jobs, key=lambda j: j['cost'], reverse=True):
+        if job['size'] >= isolate_bytes:
+            tasks.append({'jobs': [job], 'cost': job['cost'], 'isolated': True})
+        else:
+            small.append(job)
+
+    total = sum(job['cost'] for job in small)
+    target = min(batch_seconds, total / (max(workers, 1) * 4)) if small else 0
+    batch = None
+    for job in small:
+        if batch is None or batch['cost'] + job['cost'] > target:
+            batch = {'jobs': [], 'cost': 0.0, 'isolated': False}
+            tasks.append(batch)
+        batch['jobs'].append(job)
+        batch['cost'] += job['cost']
+
+    tasks.sort(key=lambda t: t['cost'], reverse=True)
+    return tasks
+
+def process_rss(pid):
+    """
+    Resident memory in bytes of a process and all its children (Linux /proc).
+    Returns None where /proc is not available.
+    """
+    total = 0
+    pending = [pid]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/status", 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for tid in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{tid}/children", 'r') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except FileNotFoundError:
+            if current == pid and not os.path.isdir("/proc"):
+                return None
+        except (OSError, ValueError):
+            continue
+    return total
+
+def _worker(handler, paths, kwargs, conn):
+    """Runs a task in a child process and reports every file to the parent"""
+    if hasattr(os, 'setpgrp'):
+        # Own process group, so external tools (Rscript) are killed with the worker
+        os.setpgrp()
+    for path in paths:
+        conn.send(('start', path))
+        start = time.perf_counter()
+        error = None
+        try:
+            handler(path, **kwargs)
+        except Exception as e:
+            error = str(e)
+        conn.send(('done', path, time.perf_counter() - start, error))
+    conn.close()
+
+def _kill(process):
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            process.kill()
+    else:
+        process.kill()
+    process.join()
+
+def next_task(pending, running, max_isolated):
+    """
+    Takes the largest pending task that may start now: isolated tasks wait
+    while max_isolated of them are running, smaller tasks go ahead meanwhile.
+    Returns None if nothing can start.
+    """
+    isolated_running = sum(1 for task in running.values() if task['isolated'])
+    for i, task in enumerate(pending):
+        if not task['isolated'] or isolated_running < max_isolated:
+            return pending.pop(i)
+    return None
+
+def run_jobs(paths, handler, kwargs=None, workers=None, timeout=3600, memory_mb=4096,
+             isolate_mb=100, max_isolated=1, batch_seconds=1.0, classify=file_kind, stats_path=None):
+    """
+    Runs handler(path, **kwargs) for every path in worker processes.
+    A file fails when the handler raises; only successful files feed the
+    cost model.
+
+    Tasks are dispatched largest estimated cost first. Every file gets at
+    most timeout seconds and every worker at most memory_mb of resident
+    memory (including its child processes, Linux only); a worker over a
+    limit is killed, its current file is reported as failed and the rest
+    of its batch is rescheduled one file per task. At most max_isolated
+    large files run at the same time, so together they stay within
+    max_isolated * memory_mb while the other workers handle small files.
+
+    Args:
+        paths: Files to process
+        handler: Module-level function (picklable for the workers)
+        kwargs: Extra keyword arguments for handler
+        workers: Number of parallel workers, default os.cpu_count()
+        timeout: Seconds per file, None for no limit
+        memory_mb: Resident memory limit per worker, None for no limit
+        isolate_mb: Files of this size or more run in a worker of their own
+        max_isolated: Number of such large files processed at the same time
+        batch_seconds: Estimated run time of a batch of small files
+        classify: Function path -> kind for the cost model
+        stats_path: JSON file with timings learned from previous runs
+
+    Returns:
+        dict with "done" (list of paths) and "failed" (path -> reason)
+    """
+    kwargs = kwargs or {}
+    workers = workers or os.cpu_count() or 1
+    model = CostModel(stats_path)
+    memory_limit = memory_mb * 1024 * 1024 if memory_mb else None
+
+    jobs = {}
+    for path in paths:
+        size = os.path.getsize(path)
+        kind = classify(path)
+        jobs[path] = {'path': path, 'kind': kind, 'size': size, 'cost': model.estimate(kind, size)}
+    pending = plan_tasks(list(jobs.values()), workers, batch_seconds, isolate_mb * 1024 * 1024)
+    if pending:
+        print(f"Scheduled {len(jobs)} files in {len(pending)} tasks on {workers} workers "
+              f"(estimated {sum(t['cost'] for t in pending):.1f} s)")
+
+    context = multiprocessing.get_context()
+    running = {}
+    result = {'done': [], 'failed': {}}
+    last_check = 0.0
+
+    def finish(conn, reason=None):
+        """Collects a finished or killed task and reschedules its unstarted files"""
+        task = running.pop(conn)
+        unfinished = [job for job in task['jobs'] if job['path'] not in task['finished']]
+        if task['current'] is not None:
+            unfinished = [job for job in unfinished if job['path'] != task['current']]
+            result['failed'][task['current']] = reason or f"worker exited with code {task['process'].exitcode}"
+            print(f"Job failed ({result['failed'][task['current']]}): {task['current']}")
+        for job in unfinished:
+            pending.append({'jobs': [job], 'cost': job['cost'], 'isolated': False})
+        pending.sort(key=lambda t: t['cost'], reverse=True)
+        conn.close()
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                task = next_task(pending, running, max_isolated)
+                if task is None:
+                    break
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_worker, daemon=True,
+                                          args=(handler, [job['path'] for job in task['jobs']], kwargs, sender))
+                process.start()
+                sender.close()
+                task.update(process=process, current=None, started=None, finished=set())
+                running[receiver] = task
+
+            for conn in wait(list(running), timeout=POLL_INTERVAL):
+                task = running[conn]
+                try:
+                    while conn.poll():
+                        message = conn.recv()
+                        if message[0] == 'start':
+                            task['current'], task['started'] = message[1], time.monotonic()
+                            continue
+                        _, path, seconds, error = message
+                        task['finished'].add(path)
+                        task['current'] = None
+                        job = jobs[path]
+                        if error is None:
+                            model.record(job['kind'], job['size'], seconds)
+                            result['done'].append(path)
+                        else:
+                            result['failed'][path] = error
+                            print(f"Job failed ({error}): {path}")
+                except EOFError:
+                    task['process'].join()
+                    finish(conn)
+
+            now = time.monotonic()
+            if now - last_check < POLL_INTERVAL:
+                continue
+            last_check = now
+            for conn, task in list(running.items()):
+                reason = None
+                if timeout and task['current'] is not None and now - task['started'] > timeout:
+                    reason = f"timeout after {timeout} s"
+                elif memory_limit:
+                    rss = process_rss(task['process'].pid)
+                    if rss is not None and rss > memory_limit:
+                        reason = f"memory limit {memory_mb} MB exceeded ({math.ceil(rss / 2 ** 20)} MB)"
+                if reason:
+                    _kill(task['process'])
+                    finish(conn, reason)
+    finally:
+        for task in running.values():
+            _kill(task['process'])
+        model.save()
+
+    return result
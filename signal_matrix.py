@@ -0,0 +1,210 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+ACAML_NS = 'urn:schemas-agilent-com:acaml21'
+STORE_NAME = "signal_matrix"
+
+def read_trace_csv(csv_path, time_only=False):
+    """
+    Reads a trace CSV written by dx_converter.R (first column is retention time).
+
+    Returns:
+        (columns, time, values) where values is a (time x channel) array,
+        or None instead of values when time_only is True
+    """
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        columns = [c.strip().strip('"') for c in f.readline().strip().split(',')]
+
+    usecols = (0,) if time_only else None
+    try:
+        data = np.loadtxt(csv_path, delimiter=',', skiprows=1, usecols=usecols, ndmin=2)
+    except ValueError:
+        # fwrite leaves NA cells empty
+        data = np.genfromtxt(csv_path, delimiter=',', skip_header=1, usecols=usecols, ndmin=2)
+
+    time = data[:, 0]
+    values = None if time_only else data[:, 1:]
+    return columns[1:], time, values
+
+def resample(time, values, grid):
+    """
+    Linear interpolation of all channels of a trace onto the grid at once.
+    Points of the grid outside the trace time range are NaN.
+    """
+    out = np.full((len(grid), values.shape[1]), np.nan, dtype=np.float64)
+    if len(time) == 0:
+        return out
+    if len(time) == 1:
+        out[grid == time[0]] = values[0]
+        return out
+
+    idx = np.clip(np.searchsorted(time, grid, side='right') - 1, 0, len(time) - 2)
+    t0, t1 = time[idx], time[idx + 1]
+    weight = ((grid - t0) / np.where(t1 > t0, t1 - t0, 1.0))[:, None]
+    out[:] = values[idx] * (1.0 - weight) + values[idx + 1] * weight
+    out[(grid < time[0]) | (grid > time[-1])] = np.nan
+    return out
+
+def read_injection_metadata(sequence_dir):
+    """
+    Collects InjectionMetaData attributes from the ACAML file(s) of a sequence,
+    keyed by the lower-cased data file name without extension
+    """
+    acaml_files = [os.path.join(sequence_dir, f) for f in sorted(os.listdir(sequence_dir))
+                   if f.lower().endswith(('.acaml', '_acaml.xml'))]
+    tag = f'{{{ACAML_NS}}}InjectionMetaData'
+    metadata = {}
+
+    for acaml_file in acaml_files:
+        try:
+            injections = []
+            for _, elem in ET.iterparse(acaml_file):
+                if elem.tag == tag:
+                    injections.append(dict(elem.attrib))
+                    elem.clear()
+        except ET.ParseError:
+            # Files with invalid characters go through the cleaning parser
+            from xml_parser import get_engine
+            engine = get_engine()
+            with open(acaml_file, 'rb') as f:
+                root = engine.parse(f.read())
+            _, findall = engine.finders({'ns': ACAML_NS})
+            injections = [dict(elem.items()) for elem in findall(root, './/ns:InjectionMetaData')]
+
+        for injection in injections:
+            raw_name = injection.get('RawDataFileName')
+            if raw_name:
+                key = os.path.splitext(os.path.basename(raw_name.replace('\\', '/')))[0].lower()
+                metadata[key] = injection
+
+    return metadata
+
+def find_injection_dirs(sequence_dir):
+    """Returns subfolders of the sequence that contain converted trace CSVs"""
+    injection_dirs = []
+    for name in sorted(os.listdir(sequence_dir)):
+        path = os.path.join(sequence_dir, name)
+        if name != STORE_NAME and os.path.isdir(path) and \
+                any(f.lower().endswith('.csv') for f in os.listdir(path)):
+            injection_dirs.append(path)
+    return injection_dirs
+
+def build_sequence_matrix(sequence_dir, injection_dirs=None, dtype=np.float32):
+    """
+    Resamples every trace of a sequence onto a common time axis and writes
+    an (injection x time x channel) array as a memory-mapped .npy store.
+
+    The store is the folder <sequence_dir>/signal_matrix with:
+        data.npy   - signal values, NaN where a trace has no data
+        time.npy   - common retention time axis
+        index.json - channel names and injection metadata from the ACAML
+
+    Args:
+        sequence_dir: Sequence folder with one subfolder per converted .dx file
+        injection_dirs: Injection folders, by default all subfolders with CSVs
+        dtype: Data type of the stored values
+
+    Returns:
+        Path to the store or None if the sequence has no traces or no
+        trace with increasing retention times
+    """
+    if injection_dirs is None:
+        injection_dirs = find_injection_dirs(sequence_dir)
+
+    # Pass 1: time ranges and channel layout without reading the values
+    traces = []
+    channels = []
+    channel_pos = {}
+    starts, ends, steps = [], [], []
+    for inj, injection_dir in enumerate(injection_dirs):
+        for csv_name in sorted(os.listdir(injection_dir)):
+            if not csv_name.lower().endswith('.csv'):
+                continue
+            csv_path = os.path.join(injection_dir, csv_name)
+            columns, time, _ = read_trace_csv(csv_path, time_only=True)
+            if len(time) == 0:
+                continue
+            trace = os.path.splitext(csv_name)[0]
+            names = [f"{trace}/{column}" for column in columns]
+            for name in names:
+                if name not in channel_pos:
+                    channel_pos[name] = len(channels)
+                    channels.append(name)
+            traces.append((inj, csv_path, [channel_pos[name] for name in names]))
+            starts.append(time[0])
+            ends.append(time[-1])
+            if len(time) > 1:
+                # Repeated timestamps give zero intervals, only positive ones define the step
+                intervals = np.diff(time)
+                intervals = intervals[intervals > 0]
+                if len(intervals):
+                    steps.append(np.median(intervals))
+
+    if not traces:
+        return None
+
+    start, end = float(min(starts)), float(max(ends))
+    if not steps:
+        if end > start:
+            print(f"Warning: no increasing time axis in {sequence_dir}, signal matrix skipped")
+            return None
+        steps = [1.0]
+    step = float(np.median(steps))
+    grid = start + step * np.arange(int(round((end - start) / step)) + 1)
+
+    store_dir = os.path.join(sequence_dir, STORE_NAME)
+    os.makedirs(store_dir, exist_ok=True)
+    np.save(os.path.join(store_dir, "time.npy"), grid)
+
+    # Pass 2: fill the memory-mapped array one trace at a time
+    data = np.lib.format.open_memmap(os.path.join(store_dir, "data.npy"), mode='w+', dtype=dtype,
+                                     shape=(len(injection_dirs), len(grid), len(channels)))
+    data[:] = np.nan
+    for inj, csv_path, positions in traces:
+        _, time, values = read_trace_csv(csv_path)
+        data[inj][:, positions] = resample(time, values, grid)
+    data.flush()
+    del data
+
+    metadata = read_injection_metadata(sequence_dir)
+    injections = []
+    for injection_dir in injection_dirs:
+        folder = os.path.basename(injection_dir)
+        meta = metadata.get(folder.lower(), {})
+        injections.append({
+            "folder": folder,
+            "sample_name": meta.get('SampleName'),
+            "vial_number": meta.get('VialNumber'),
+            "injector_position": meta.get('InjectorPosition'),
+            "acq_datetime": meta.get('InjectionAcqDateTime'),
+            "metadata": meta,
+        })
+
+    index = {
+        "axes": ["injection", "time", "channel"],
+        "shape": [len(injection_dirs), len(grid), len(channels)],
+        "dtype": np.dtype(dtype).name,
+        "time_step": step,
+        "channels": channels,
+        "injections": injections,
+    }
+    with open(os.path.join(store_dir, "index.json"), 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+
+    return store_dir
+
+def open_sequence_matrix(store_dir):
+    """
+    Opens a store written by build_sequence_matrix without loading the data.
+
+    Returns:
+        (data, time, index) where data is a read-only memory-mapped array
+    """
+    data = np.load(os.path.join(store_dir, "data.npy"), mmap_mode='r')
+    time = np.load(os.path.join(store_dir, "time.npy"))
+    with open(os.path.join(store_dir, "index.json"), 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    return data, time, index
@@ -7,6 +7,11 @@ import gzip
 import io
 import html
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
 def clean_invalid_xml_chars(xml_str):
     """Удаление недопустимых символов из XML-строки"""
     return re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', xml_str)
@@ -27,10 +32,108 @@ def decode_xml_content(content_type, content_text):
     
     return html.unescape(content_text)
 
-def parse_fileset(xml_root):
+class EtreeEngine:
+    """Parser backend on the standard library xml.etree.ElementTree"""
+    name = "etree"
+
+    def parse(self, data):
+        xml_str = clean_invalid_xml_chars(data.decode('utf-8', errors='ignore'))
+        return ET.parse(io.StringIO(xml_str)).getroot()
+
+    def finders(self, namespace):
+        """Returns (find, findall) callables bound to the namespace map"""
+        def find(elem, path):
+            return elem.find(path, namespace)
+
+        def findall(elem, path):
+            return elem.findall(path, namespace)
+
+        return find, findall
+
+class LxmlEngine:
+    """
+    Parser backend on lxml with precompiled XPath expressions.
+
+    Clean documents are parsed straight from bytes; the manual character
+    stripping is only applied when the bytes contain characters that the
+    etree backend would remove, so both backends see the same content.
+    Comments and processing instructions are dropped like ElementTree does,
+    which keeps ET.tostring() output identical for both backends.
+    """
+    name = "lxml"
+
+    # C0 controls (except tab/LF/CR), DEL and UTF-8 encoded C1 controls
+    _control_bytes = re.compile(rb'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+    _c1_bytes = re.compile(rb'\xc2[\x80-\x9f]')
+
+    def __init__(self):
+        options = dict(encoding='utf-8', huge_tree=True,
+                       remove_comments=True, remove_pis=True)
+        self._strict_parser = lxml_etree.XMLParser(**options)
+        self._recover_parser = lxml_etree.XMLParser(recover=True, **options)
+        self._xpaths = {}
+
+    def parse(self, data):
+        dirty = (self._control_bytes.search(data) is not None
+                 or (b'\xc2' in data and self._c1_bytes.search(data) is not None))
+        if not dirty:
+            try:
+                return lxml_etree.fromstring(data, self._strict_parser)
+            except lxml_etree.XMLSyntaxError:
+                pass
+        xml_str = clean_invalid_xml_chars(data.decode('utf-8', errors='ignore'))
+        root = lxml_etree.fromstring(xml_str.encode('utf-8'), self._recover_parser)
+        if root is None:
+            raise ValueError("no element found")
+        return root
+
+    def finders(self, namespace):
+        """Returns (find, findall) callables backed by XPath compiled once per namespace"""
+        compiled = self._xpaths.setdefault(tuple(sorted(namespace.items())), {})
+
+        def xpath(path, first):
+            key = (path, first)
+            if key not in compiled:
+                expr = f"({path})[1]" if first else path
+                compiled[key] = lxml_etree.XPath(expr, namespaces=namespace)
+            return compiled[key]
+
+        def find(elem, path):
+            hits = xpath(path, True)(elem)
+            return hits[0] if hits else None
+
+        def findall(elem, path):
+            return xpath(path, False)(elem)
+
+        return find, findall
+
+ENGINES = {EtreeEngine.name: EtreeEngine}
+if lxml_etree is not None:
+    ENGINES[LxmlEngine.name] = LxmlEngine
+
+# The full XML dump goes through ET.tostring() for both engines to keep reports
+# byte-identical, so etree stays the default (see bench_xml_parser.py)
+DEFAULT_ENGINE = EtreeEngine.name
+
+_engine_instances = {}
+
+def get_engine(engine=None):
+    """Returns a shared engine instance by name (or passes an instance through)"""
+    if engine is None:
+        engine = DEFAULT_ENGINE
+    if not isinstance(engine, str):
+        return engine
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown parser engine: {engine} (available: {', '.join(ENGINES)})")
+    if engine not in _engine_instances:
+        _engine_instances[engine] = ENGINES[engine]()
+    return _engine_instances[engine]
+
+def parse_fileset(xml_root, engine=None):
     """Парсинг Fileset XML с красивым форматированием"""
     result = ["=== Fileset XML ==="]
     namespace = {'ns': 'urn:schemas-agilent-com:Fileset'}
+    _, findall = get_engine(engine).finders(namespace)
     
     # Основная информация о Fileset
     fileset_info = {
@@ -42,7 +145,7 @@ def parse_fileset(xml_root):
         result.append(f"  {key}: {value if value else 'N/A'}")
     
     # Детальная информация о файлах
-    files = xml_root.findall('.//ns:File', namespace)
+    files = findall(xml_root, './/ns:File')
     if files:
         result.append("\nFiles:")
         for i, file in enumerate(files, 1):
@@ -54,7 +157,7 @@ def parse_fileset(xml_root):
             
             # Свойства файла
             properties = {}
-            for prop in file.findall('.//ns:Property', namespace):
+            for prop in findall(file, './/ns:Property'):
                 properties[prop.get('Name')] = prop.get('Value')
             
             result.append(f"\nFile #{i}:")
@@ -72,97 +175,98 @@ def parse_fileset(xml_root):
     
     return "\n".join(result)
 
-def parse_acaml(xml_root):
+def parse_acaml(xml_root, engine=None):
     """Parse ACAML XML with detailed formatting in English"""
     result = ["=== ACAML XML ==="]
     namespace = {'ns': 'urn:schemas-agilent-com:acaml21'}
+    find, findall = get_engine(engine).finders(namespace)
     
     # 1. Basic Information
     result.append("\n--- BASIC INFORMATION ---")
     
     # Checksum
-    checksum = xml_root.find('.//ns:Checksum', namespace)
+    checksum = find(xml_root, './/ns:Checksum')
     if checksum is not None:
         result.append("\n* Checksum:")
         result.append(f"  Algorithm: {checksum.get('Algorithm')}")
-        result.append(f"  Value: {checksum.find('.//ns:Value', namespace).text}")
+        result.append(f"  Value: {find(checksum, './/ns:Value').text}")
     
     # Migration History
-    migrations = xml_root.findall('.//ns:MigrationStep', namespace)
+    migrations = findall(xml_root, './/ns:MigrationStep')
     if migrations:
         result.append("\n* Migration History:")
         for i, migration in enumerate(migrations, 1):
             result.append(f"\n  Migration #{i}:")
-            result.append(f"    From: {migration.find('.//ns:FromNamespace', namespace).text}")
-            result.append(f"    To: {migration.find('.//ns:ToNamespace', namespace).text}")
-            result.append(f"    Date: {migration.find('.//ns:Date', namespace).text}")
-            result.append(f"    Application: {migration.find('.//ns:Application', namespace).text}")
+            result.append(f"    From: {find(migration, './/ns:FromNamespace').text}")
+            result.append(f"    To: {find(migration, './/ns:ToNamespace').text}")
+            result.append(f"    Date: {find(migration, './/ns:Date').text}")
+            result.append(f"    Application: {find(migration, './/ns:Application').text}")
     
     # 2. Document Information
-    doc_info = xml_root.find('.//ns:DocInfo', namespace)
+    doc_info = find(xml_root, './/ns:DocInfo')
     if doc_info is not None:
         result.append("\n--- DOCUMENT INFORMATION ---")
-        result.append(f"\n* Document ID: {xml_root.find('.//ns:DocID', namespace).text}")
-        result.append(f"* Description: {doc_info.find('.//ns:Description', namespace).text}")
-        result.append(f"* Created by user: {doc_info.find('.//ns:CreatedByUser', namespace).text}")
+        result.append(f"\n* Document ID: {find(xml_root, './/ns:DocID').text}")
+        result.append(f"* Description: {find(doc_info, './/ns:Description').text}")
+        result.append(f"* Created by user: {find(doc_info, './/ns:CreatedByUser').text}")
         
         # Application information
-        app_info = doc_info.find('.//ns:AgilentApp', namespace)
+        app_info = find(doc_info, './/ns:AgilentApp')
         if app_info is not None:
             result.append("\n* Created by application:")
-            result.append(f"  Name: {app_info.find('.//ns:Name', namespace).text}")
-            result.append(f"  Version: {app_info.find('.//ns:Version', namespace).text}")
+            result.append(f"  Name: {find(app_info, './/ns:Name').text}")
+            result.append(f"  Version: {find(app_info, './/ns:Version').text}")
         
-        result.append(f"* Creation date: {doc_info.find('.//ns:CreationDate', namespace).text}")
-        result.append(f"* Client: {doc_info.find('.//ns:ClientName', namespace).text}")
+        result.append(f"* Creation date: {find(doc_info, './/ns:CreationDate').text}")
+        result.append(f"* Client: {find(doc_info, './/ns:ClientName').text}")
         
         # Custom Fields
-        custom_fields = doc_info.findall('.//ns:CustomField', namespace)
+        custom_fields = findall(doc_info, './/ns:CustomField')
         if custom_fields:
             result.append("\n* Custom Fields:")
             for field in custom_fields:
                 name = field.get('Name')
-                value = field.find('.//ns:Value', namespace).text if field.find('.//ns:Value', namespace) is not None else ""
+                value = find(field, './/ns:Value').text if find(field, './/ns:Value') is not None else ""
                 result.append(f"  {name}: {value}")
                 
                 # Special handling for InjectionMetaDataItems
                 if name == "InjectionMetaDataItems":
-                    xml_content = field.find('.//ns:Xml', namespace)
+                    xml_content = find(field, './/ns:Xml')
                     if xml_content is not None and xml_content.text:
                         decoded = decode_xml_content(None, xml_content.text)
                         result.append("  Decoded XML content:")
                         result.append(decoded)
     
     # 3. Resources (Instruments)
-    resources = xml_root.find('.//ns:Resources', namespace)
+    resources = find(xml_root, './/ns:Resources')
     if resources is not None:
         result.append("\n--- RESOURCES ---")
         
         # Instruments
-        instruments = resources.findall('.//ns:Instrument', namespace)
+        instruments = findall(resources, './/ns:Instrument')
         if instruments:
             result.append("\n* Instruments:")
             for instrument in instruments:
-                result.append(f"\n  Instrument: {instrument.find('.//ns:Name', namespace).text}")
+                result.append(f"\n  Instrument: {find(instrument, './/ns:Name').text}")
                 result.append(f"    ID: {instrument.get('id')}")
-                result.append(f"    Technique: {instrument.find('.//ns:Technique', namespace).text}")
+                result.append(f"    Technique: {find(instrument, './/ns:Technique').text}")
                 
                 # Modules
-                modules = instrument.findall('.//ns:Module', namespace)
+                modules = findall(instrument, './/ns:Module')
                 if modules:
                     result.append("\n    Modules:")
                     for module in modules:
-                        result.append(f"\n      - Name: {module.find('.//ns:Name', namespace).text}")
-                        result.append(f"        Type: {module.find('.//ns:Type', namespace).text}")
-                        result.append(f"        Manufacturer: {module.find('.//ns:Manufacturer', namespace).text}")
-                        result.append(f"        Part No: {module.find('.//ns:PartNo', namespace).text}")
-                        result.append(f"        Serial No: {module.find('.//ns:SerialNo', namespace).text}")
-                        result.append(f"        Firmware Revision: {module.find('.//ns:FirmwareRevision', namespace).text}")
-                        result.append(f"        Connection Info: {module.find('.//ns:ConnectionInfo', namespace).text}")
-                        result.append(f"        Instance: {module.find('.//ns:Instance', namespace).text}")
+                        result.append(f"\n      - Name: {find(module, './/ns:Name').text}")
+                        result.append(f"        Type: {find(module, './/ns:Type').text}")
+                        result.append(f"        Manufacturer: {find(module, './/ns:Manufacturer').text}")
+                        result.append(f"        Part No: {find(module, './/ns:PartNo').text}")
+                        result.append(f"        Serial No: {find(module, './/ns:SerialNo').text}")
+                        result.append(f"        Firmware Revision: {find(module, './/ns:FirmwareRevision').text}")
+                        result.append(f"        Connection Info: {find(module, './/ns:ConnectionInfo').text}")
+                        result.append(f"        Instance: {find(module, './/ns:Instance').text}")
     
     # 4. Injections
-    injections = xml_root.findall('.//ns:InjectionMetaData', namespace)
+    injections = findall(xml_root, './/ns:InjectionMetaData')
     if injections:
         result.append("\n--- INJECTION INFORMATION ---")
         for i, injection in enumerate(injections, 1):
@@ -189,7 +293,7 @@ def parse_acaml(xml_root):
                     result.append(f"  {child.tag.split('}')[-1]}: {child.text}")
     
     # 5. Signals
-    signals = xml_root.findall('.//ns:Signal', namespace)
+    signals = findall(xml_root, './/ns:Signal')
     if signals:
         result.append("\n--- SIGNALS ---")
         result.append(f"Total signals: {len(signals)}")
@@ -197,7 +301,7 @@ def parse_acaml(xml_root):
         # Group by signal type
         signal_types = {}
         for signal in signals:
-            sig_type = signal.find('.//ns:Type', namespace).text
+            sig_type = find(signal, './/ns:Type').text
             if sig_type not in signal_types:
                 signal_types[sig_type] = []
             signal_types[sig_type].append(signal)
@@ -205,19 +309,19 @@ def parse_acaml(xml_root):
         for sig_type, sig_list in signal_types.items():
             result.append(f"\n* Signal Type: {sig_type} ({len(sig_list)} signals)")
             for signal in sig_list:
-                result.append(f"\n  - Name: {signal.find('.//ns:Name', namespace).text}")
-                result.append(f"    Description: {signal.find('.//ns:Description', namespace).text}")
-                result.append(f"    Trace ID: {signal.find('.//ns:TraceID', namespace).text}")
-                result.append(f"    Detector: {signal.find('.//ns:DetectorName', namespace).text}")
-                result.append(f"    Channel: {signal.find('.//ns:ChannelName', namespace).text}")
+                result.append(f"\n  - Name: {find(signal, './/ns:Name').text}")
+                result.append(f"    Description: {find(signal, './/ns:Description').text}")
+                result.append(f"    Trace ID: {find(signal, './/ns:TraceID').text}")
+                result.append(f"    Detector: {find(signal, './/ns:DetectorName').text}")
+                result.append(f"    Channel: {find(signal, './/ns:ChannelName').text}")
                 
                 # Binary data references
-                binary_data = signal.findall('.//ns:DataItem', namespace)
+                binary_data = findall(signal, './/ns:DataItem')
                 if binary_data:
                     result.append("\n    Data References:")
                     for data in binary_data:
-                        result.append(f"      Name: {data.find('.//ns:Name', namespace).text}")
-                        result.append(f"      Path: {data.find('.//ns:Path', namespace).text}")
+                        result.append(f"      Name: {find(data, './/ns:Name').text}")
+                        result.append(f"      Path: {find(data, './/ns:Path').text}")
     
     # 6. Full XML content
     result.append("\n--- FULL XML CONTENT ---")
@@ -226,24 +330,25 @@ def parse_acaml(xml_root):
     
     return "\n".join(result)
 
-def parse_sample_container(xml_root):
+def parse_sample_container(xml_root, engine=None):
     """Парсинг SampleContainerInfo XML"""
     result = ["=== SampleContainerInfo XML ==="]
+    find, _ = get_engine(engine).finders({})
     
     # Информация об устройстве
-    device_info = xml_root.find('.//ContainerDeviceInfo')
+    device_info = find(xml_root, './/ContainerDeviceInfo')
     if device_info is not None:
         result.append("\nDevice Info:")
         result.append(f"Module ID: {device_info.get('ModuleId')}")
-        result.append(f"Serial: {device_info.find('.//SerialNumber').text}")
-        result.append(f"Part: {device_info.find('.//PartNumber').text}")
+        result.append(f"Serial: {find(device_info, './/SerialNumber').text}")
+        result.append(f"Part: {find(device_info, './/PartNumber').text}")
         
         # Декодированное содержимое
-        container_device = device_info.find('.//SampleContainerDevice')
+        container_device = find(device_info, './/SampleContainerDevice')
         if container_device is not None:
             decoded = decode_xml_content(
                 container_device.get('ContentType'),
-                container_device.find('.//XmlContent').text)
+                find(container_device, './/XmlContent').text)
             result.append("\nDecoded Device Content:")
             result.append(decoded[:1000] + ("..." if len(decoded) > 1000 else ""))
     
@@ -253,13 +358,14 @@ def parse_sample_container(xml_root):
     
     return "\n".join(result)
 
-def parse_content_types(xml_root):
+def parse_content_types(xml_root, engine=None):
     """Парсинг Content Types XML с красивым форматированием"""
     result = ["=== Content Types XML ==="]
     namespace = {'ns': 'http://schemas.openxmlformats.org/package/2006/content-types'}
+    _, findall = get_engine(engine).finders(namespace)
     
     # Форматированная таблица
-    defaults = xml_root.findall('.//ns:Default', namespace)
+    defaults = findall(xml_root, './/ns:Default')
     if defaults:
         result.append("\nContent Type Mappings:")
         result.append("+------------+--------------------------------------------------------------+")
@@ -279,40 +385,41 @@ def parse_content_types(xml_root):
     
     return "\n".join(result)
 
-def parse_acmd(xml_root):
+def parse_acmd(xml_root, engine=None):
     """Parse ACMD XML with detailed formatting and no truncation"""
     result = ["=== ACMD XML ==="]
     namespace = {'ns': 'urn:schemas-agilent-com:acmd20'}
+    find, findall = get_engine(engine).finders(namespace)
     
     # 1. Injection Information
-    injection = xml_root.find('.//ns:InjectionInfo', namespace)
+    injection = find(xml_root, './/ns:InjectionInfo')
     if injection is not None:
         result.append("\n--- INJECTION INFORMATION ---")
         result.append("\n* Sample Details:")
-        result.append(f"  - Name: {injection.find('.//ns:SampleName', namespace).text}")
-        result.append(f"  - Location: {injection.find('.//ns:Location', namespace).text}")
-        result.append(f"  - Operator: {injection.find('.//ns:RunOperator', namespace).text}")
-        result.append(f"  - Run Time: {injection.find('.//ns:RunDateTime', namespace).text}")
+        result.append(f"  - Name: {find(injection, './/ns:SampleName').text}")
+        result.append(f"  - Location: {find(injection, './/ns:Location').text}")
+        result.append(f"  - Operator: {find(injection, './/ns:RunOperator').text}")
+        result.append(f"  - Run Time: {find(injection, './/ns:RunDateTime').text}")
         
         result.append("\n* Injection Parameters:")
-        result.append(f"  - Volume: {injection.find('.//ns:InjectionVolume', namespace).text} "
-                     f"{injection.find('.//ns:InjectionVolumeUnits', namespace).text}")
-        result.append(f"  - Sequence Line: {injection.find('.//ns:SequenceLine', namespace).text}")
-        result.append(f"  - Replicate: {injection.find('.//ns:Replicate', namespace).text}")
-        result.append(f"  - Source: {injection.find('.//ns:InjectionSource', namespace).text}")
+        result.append(f"  - Volume: {find(injection, './/ns:InjectionVolume').text} "
+                     f"{find(injection, './/ns:InjectionVolumeUnits').text}")
+        result.append(f"  - Sequence Line: {find(injection, './/ns:SequenceLine').text}")
+        result.append(f"  - Replicate: {find(injection, './/ns:Replicate').text}")
+        result.append(f"  - Source: {find(injection, './/ns:InjectionSource').text}")
         
-        method = injection.find('.//ns:AcquisitionMethod', namespace)
+        method = find(injection, './/ns:AcquisitionMethod')
         if method is not None:
             result.append("\n* Method:")
             result.append(f"  {method.text}")
         
-        barcode = injection.find('.//ns:Barcode', namespace)
+        barcode = find(injection, './/ns:Barcode')
         if barcode is not None and barcode.text:
             result.append("\n* Barcode:")
             result.append(f"  {barcode.text}")
 
     # 2. Signal Analysis - Show ALL signals without truncation
-    signals = xml_root.findall('.//ns:Signal', namespace)
+    signals = findall(xml_root, './/ns:Signal')
     if signals:
         result.append("\n--- SIGNAL ANALYSIS ---")
         result.append(f"Total signals detected: {len(signals)}")
@@ -320,7 +427,7 @@ def parse_acmd(xml_root):
         # Group by device type
         devices = {}
         for signal in signals:
-            device = signal.find('.//ns:DeviceName', namespace).text
+            device = find(signal, './/ns:DeviceName').text
             if device not in devices:
                 devices[device] = []
             devices[device].append(signal)
@@ -329,29 +436,29 @@ def parse_acmd(xml_root):
             result.append(f"\n* Device: {device} ({len(sig_list)} signals)")
             
             for sig in sig_list:
-                result.append("\n  - Channel: " + (sig.find('.//ns:ChannelName', namespace).text or "N/A"))
-                result.append(f"    Description: {sig.find('.//ns:Description', namespace).text}")
-                result.append(f"    Type: {sig.find('.//ns:Encoding', namespace).text.split('/')[-1]}")
-                result.append(f"    Units: {sig.find('.//ns:Units', namespace).text}")
-                result.append(f"    Data Points: {sig.find('.//ns:NumberOfValues', namespace).text}")
-                result.append(f"    Time Range: {sig.find('.//ns:TimeStart', namespace).text}-"
-                            f"{sig.find('.//ns:TimeEnd', namespace).text}")
-                result.append(f"    Value Range: {sig.find('.//ns:Minimum', namespace).text}-"
-                            f"{sig.find('.//ns:Maximum', namespace).text}")
-                result.append(f"    Trace ID: {sig.find('.//ns:TraceId', namespace).text}")
+                result.append("\n  - Channel: " + (find(sig, './/ns:ChannelName').text or "N/A"))
+                result.append(f"    Description: {find(sig, './/ns:Description').text}")
+                result.append(f"    Type: {find(sig, './/ns:Encoding').text.split('/')[-1]}")
+                result.append(f"    Units: {find(sig, './/ns:Units').text}")
+                result.append(f"    Data Points: {find(sig, './/ns:NumberOfValues').text}")
+                result.append(f"    Time Range: {find(sig, './/ns:TimeStart').text}-"
+                            f"{find(sig, './/ns:TimeEnd').text}")
+                result.append(f"    Value Range: {find(sig, './/ns:Minimum').text}-"
+                            f"{find(sig, './/ns:Maximum').text}")
+                result.append(f"    Trace ID: {find(sig, './/ns:TraceId').text}")
                 
                 # Additional signal properties
-                result.append(f"    Device Number: {sig.find('.//ns:DeviceNumber', namespace).text}")
-                result.append(f"    Slope: {sig.find('.//ns:Slope', namespace).text}")
-                result.append(f"    Scale Factor: {sig.find('.//ns:ScaleFactor', namespace).text}")
-                result.append(f"    Detector Type: {sig.find('.//ns:DetectorType', namespace).text}")
+                result.append(f"    Device Number: {find(sig, './/ns:DeviceNumber').text}")
+                result.append(f"    Slope: {find(sig, './/ns:Slope').text}")
+                result.append(f"    Scale Factor: {find(sig, './/ns:ScaleFactor').text}")
+                result.append(f"    Detector Type: {find(sig, './/ns:DetectorType').text}")
                 
                 # Highlight integrable signals
-                if sig.find('.//ns:IsIntegrable', namespace).text.lower() == 'true':
+                if find(sig, './/ns:IsIntegrable').text.lower() == 'true':
                     result.append("    NOTE: This signal is integrable")
     
     # 3. External References
-    ext_refs = xml_root.findall('.//ns:ExternalElementPaths', namespace)
+    ext_refs = findall(xml_root, './/ns:ExternalElementPaths')
     if any(ref.text for ref in ext_refs):
         result.append("\n--- EXTERNAL REFERENCES ---")
         result.append("Linked data files:")
@@ -365,35 +472,107 @@ def parse_acmd(xml_root):
     
     return "\n".join(result)
 
-def parse_xml(file_path):
+# Root element sniffing: enough of the file to get past the XML declaration,
+# comments and DOCTYPE of Agilent files
+SNIFF_BYTES = 8192
+
+_PROLOG_ITEM = re.compile(rb'\s*(?:<\?.*?\?>|<!--.*?-->|<!DOCTYPE(?:[^\[>]|\[.*?\])*>)', re.S)
+_ROOT_START = re.compile(
+    rb'\s*<([^\s/>!?]+)((?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*)\s*/?>')
+_XMLNS_ATTR = re.compile(rb'xmlns(?::([^\s=]+))?\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+def sniff_root_tag(file_path, max_bytes=SNIFF_BYTES):
+    """
+    Reads only the beginning of the file and returns the root tag in
+    ElementTree notation ("{namespace}Name" or "Name").
+    Returns None if the root element is not found within max_bytes.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(max_bytes)
+    
+    pos = 3 if head.startswith(b'\xef\xbb\xbf') else 0
+    while True:
+        item = _PROLOG_ITEM.match(head, pos)
+        if item is None:
+            break
+        pos = item.end()
+    
+    start = _ROOT_START.match(head, pos)
+    if start is None:
+        return None
+    
+    name = start.group(1).decode('utf-8', errors='ignore')
+    prefix, _, local = name.rpartition(':')
+    namespaces = {}
+    for ns in _XMLNS_ATTR.finditer(start.group(2)):
+        uri = ns.group(2) if ns.group(2) is not None else ns.group(3)
+        namespaces[(ns.group(1) or b'').decode('utf-8', errors='ignore')] = \
+            html.unescape(uri.decode('utf-8', errors='ignore'))
+    
+    uri = namespaces.get(prefix)
+    return f"{{{uri}}}{local}" if uri else local
+
+def detect_xml_type(tag):
+    """Returns the XML_PARSERS key for a root tag or None for unknown types"""
+    if tag.endswith('Fileset') or 'urn:schemas-agilent-com:Fileset' in tag:
+        return 'fileset'
+    elif tag.endswith('ACAML') or 'urn:schemas-agilent-com:acaml21' in tag:
+        return 'acaml'
+    elif tag == 'SampleContainerInfo':
+        return 'sample_container'
+    elif tag.endswith('Types') or 'http://schemas.openxmlformats.org/package/2006/content-types' in tag:
+        return 'content_types'
+    elif tag.endswith('ACMD') or 'urn:schemas-agilent-com:acmd20' in tag:
+        return 'acmd'
+    return None
+
+XML_PARSERS = {
+    'fileset': parse_fileset,
+    'acaml': parse_acaml,
+    'sample_container': parse_sample_container,
+    'content_types': parse_content_types,
+    'acmd': parse_acmd,
+}
+
+def parse_xml(file_path, engine=None):
+    """
+    Parses an Agilent XML file with the given engine name ("lxml"/"etree",
+    default DEFAULT_ENGINE). Unknown types are recognised from the sniffed
+    root tag and returned as text without building the tree.
+    """
     try:
+        engine = get_engine(engine)
+        tag = sniff_root_tag(file_path)
+        
         with open(file_path, 'rb') as f:
-            xml_str = clean_invalid_xml_chars(f.read().decode('utf-8', errors='ignore'))
+            data = f.read()
         
-        tree = ET.parse(io.StringIO(xml_str))
-        root = tree.getroot()
+        if tag is None or detect_xml_type(tag) is not None:
+            root = engine.parse(data)
+            tag = root.tag
+            xml_type = detect_xml_type(tag)
+            if xml_type is not None:
+                return XML_PARSERS[xml_type](root, engine)
         
-        if root.tag.endswith('Fileset') or 'urn:schemas-agilent-com:Fileset' in root.tag:
-            return parse_fileset(root)
-        elif root.tag.endswith('ACAML') or 'urn:schemas-agilent-com:acaml21' in root.tag:
-            return parse_acaml(root)
-        elif root.tag == 'SampleContainerInfo':
-            return parse_sample_container(root)
-        elif root.tag.endswith('Types') or 'http://schemas.openxmlformats.org/package/2006/content-types' in root.tag:
-            return parse_content_types(root)
-        elif root.tag.endswith('ACMD') or 'urn:schemas-agilent-com:acmd20' in root.tag:
-            return parse_acmd(root)
-        else:
-            return f"Unknown XML type: {root.tag}\n\nFull Content:\n{xml_str}"
+        xml_str = clean_invalid_xml_chars(data.decode('utf-8', errors='ignore'))
+        return f"Unknown XML type: {tag}\n\nFull Content:\n{xml_str}"
     
     except Exception as e:
         return f"Error processing file: {str(e)}\n\nFile content:\n{open(file_path, 'r', errors='ignore').read()}"
 
-def save_to_txt(content, output_path):
-    """Сохраняет результат в текстовый файл"""
-    with open(output_path, 'w', encoding='utf-8') as f:
+def save_to_txt(content, output_path, compression=None):
+    """
+    Сохраняет результат в текстовый файл, при compression ("gzip"/"xz"/"zstd")
+    потоково сжимает его и добавляет расширение (.gz/.xz/.zst).
+    Возвращает путь к записанному файлу.
+    """
+    from output_sinks import output_path as compressed_path, open_output
+    
+    output_path = compressed_path(output_path, compression)
+    with open_output(output_path, compression) as f:
         f.write(content)
     print(f"Результат сохранён в: {output_path}")
+    return output_path
     
 
 def process_test_files():